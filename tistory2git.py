@@ -1,5 +1,10 @@
 import os
 import re
+import sys
+import json
+import gzip
+import hashlib
+import shutil
 import threading
 import requests
 import feedparser
@@ -19,6 +24,10 @@ GITHUB_REPO_NAME = os.getenv("GITHUB_REPO_NAME")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
 REPO_LOCAL_PATH = "./temp_staging_area"
+# 원본 아카이브 (재변환용, content-addressed + gzip)
+ARCHIVE_PATH = "./raw_archive"
+ARCHIVE_MANIFEST = os.path.join(ARCHIVE_PATH, "manifest.jsonl")  # append-only, URL당 여러 줄 병합
+ARCHIVE_LOCK = threading.Lock()
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 # GUI 체크
@@ -72,6 +81,28 @@ class BlogBackupCore:
                     raw_date = match.group(1).replace(" ", "")
                     final_date = datetime.strptime(raw_date, "%Y.%m.%d").strftime("%Y-%m-%d")
 
+            # 원본 보관 (변환 규칙이 바뀌어도 다시 스크래핑하지 않도록)
+            known_file = self.load_manifest().get(post_data['link'], {}).get('md_file')
+            self.archive_post(post_data, res.text, str(content_div), final_date)
+            log_callback("🗄️  원본 아카이브 저장 완료")
+
+            md_file = self.convert_and_save(post_data['title'], str(content_div), final_date, log_callback, md_file=known_file)
+            if md_file != known_file: self.record_md_file(post_data['link'], md_file)
+
+            # 업로드
+            log_callback("☁️  GitHub 업로드 중...")
+            self.upload_via_api(f"Add post: {post_data['title']}", log_callback)
+            log_callback("✅ 완료!")
+
+        except Exception as e:
+            log_callback(f"❌ 오류: {e}")
+            import traceback
+            traceback.print_exc()
+
+    def convert_and_save(self, title, body_html, date, log_callback=print, md_file=None):
+        """본문 HTML → Markdown 변환 후 스테이징 영역에 저장 (스크래핑과 분리). _posts 경로 반환"""
+        # 이미 게시된 글은 기존 경로를 그대로 사용 (파일명이 바뀌면 중복 글이 생김)
+        if not md_file:
             # [수정됨] Slug(파일명) 생성 프롬프트 개선
             log_callback("🤖 AI: 파일명(Slug) 생성 중...")
             slug_response = client.chat.completions.create(
@@ -81,41 +112,125 @@ class BlogBackupCore:
                     "content": "You are a slug generator. Output ONLY the English kebab-case string. Do not output any explanation, punctuation, or dates."
                 }, {
                     "role": "user", 
-                    "content": f"Convert this title to a strict English kebab-case slug: {post_data['title']}"
-                }]
+                    "content": f"Convert this title to a strict English kebab-case slug: {title}"
+                }],
+                temperature=0.0
             )
             slug = slug_response.choices[0].message.content.strip()
             # 혹시 모를 공백/특수문자 한번 더 제거
             slug = re.sub(r'[^a-zA-Z0-9-]', '', slug)
-            
-            # [수정됨] 이미지 URL 정제
-            log_callback("🔗 이미지 링크 변환 중 (다운로드 안함)...")
-            processed_html = self.clean_image_urls(str(content_div))
-
-            # [수정됨] Markdown 변환 (카테고리 규칙 적용)
-            log_callback("📝 AI: Markdown 변환 및 카테고리 분류 중...")
-            md_content = self.convert_to_markdown(processed_html, post_data['title'], final_date)
-
-            # 파일 저장
-            yy_mm_dd = datetime.strptime(final_date, "%Y-%m-%d").strftime("%y-%m-%d")
-            md_filename = f"{yy_mm_dd}-{slug}.md"
-            md_file_path = os.path.join(REPO_LOCAL_PATH, "_posts", md_filename)
-            os.makedirs(os.path.dirname(md_file_path), exist_ok=True)
-            
-            with open(md_file_path, "w", encoding="utf-8") as f:
-                f.write(md_content)
-            
-            log_callback(f"💾 파일 생성: {md_filename}")
+            yy_mm_dd = datetime.strptime(date, "%Y-%m-%d").strftime("%y-%m-%d")
+            md_file = f"_posts/{yy_mm_dd}-{slug}.md"
+        
+        # [수정됨] 이미지 URL 정제
+        log_callback("🔗 이미지 링크 변환 중 (다운로드 안함)...")
+        processed_html = self.clean_image_urls(body_html)
 
-            # 업로드
-            log_callback("☁️  GitHub 업로드 중...")
-            self.upload_via_api(f"Add post: {post_data['title']}", log_callback)
-            log_callback("✅ 완료!")
+        # [수정됨] Markdown 변환 (카테고리 규칙 적용)
+        log_callback("📝 AI: Markdown 변환 및 카테고리 분류 중...")
+        md_content = self.convert_to_markdown(processed_html, title, date)
 
-        except Exception as e:
-            log_callback(f"❌ 오류: {e}")
-            import traceback
-            traceback.print_exc()
+        # 파일 저장
+        md_file_path = os.path.join(REPO_LOCAL_PATH, md_file)
+        os.makedirs(os.path.dirname(md_file_path), exist_ok=True)
+        
+        with open(md_file_path, "w", encoding="utf-8") as f:
+            f.write(md_content)
+        
+        log_callback(f"💾 파일 생성: {md_file}")
+        return md_file
+
+    def process_reconvert(self, log_callback=print):
+        """아카이브에 저장된 본문으로 변환/저장/업로드만 다시 수행"""
+        manifest = self.load_manifest()
+        if not manifest:
+            log_callback("⚠️ 아카이브가 비어 있습니다.")
+            return
+
+        # 이전 실행의 잔여 파일(옛 파일명 등)이 다시 업로드되지 않도록 비움
+        if os.path.exists(REPO_LOCAL_PATH):
+            shutil.rmtree(REPO_LOCAL_PATH)
+        os.makedirs(REPO_LOCAL_PATH, exist_ok=True)
+
+        total_count = len(manifest)
+        log_callback(f"♻️  아카이브 재변환 시작: {total_count}개")
+        done_count = 0
+        for idx, (link, entry) in enumerate(manifest.items()):
+            try:
+                log_callback(f"[{idx+1}/{total_count}] 재변환: {entry['title']}")
+                body_html = self.load_archived_object(entry['body'])
+                md_file = self.convert_and_save(entry['title'], body_html, entry['date'], log_callback, md_file=entry.get('md_file'))
+                if md_file != entry.get('md_file'): self.record_md_file(link, md_file)
+                done_count += 1
+            except Exception as e:
+                log_callback(f"❌ 실패 ({entry['title']}): {e}")
+
+        if not done_count:
+            log_callback("⚠️ 성공한 글이 없습니다.")
+            return
+
+        log_callback("☁️  GitHub 업로드 중...")
+        self.upload_via_api(f"Reconvert {done_count} posts from archive", log_callback)
+        log_callback("✅ 완료!")
+
+    # --- 원본 아카이브 ---
+    def archive_post(self, post_data, raw_html, body_html, date):
+        """원본 페이지와 본문을 압축 저장하고 manifest에 글 URL과 함께 기록"""
+        with ARCHIVE_LOCK:
+            self._append_manifest(post_data['link'], {
+                "title": post_data['title'],
+                "date": date,
+                "raw": self._store_object(raw_html),
+                "body": self._store_object(body_html),
+                "archived_at": datetime.now().isoformat(timespec="seconds"),
+            })
+
+    def record_md_file(self, link, md_file):
+        """게시된 _posts 경로 기록 (두 스크립트가 파일명 형식이 달라도 같은 파일을 갱신하도록)"""
+        with ARCHIVE_LOCK:
+            self._append_manifest(link, {"md_file": md_file})
+
+    def _append_manifest(self, link, fields):
+        # 글마다 manifest 전체를 다시 쓰지 않도록 한 줄씩 추가
+        os.makedirs(ARCHIVE_PATH, exist_ok=True)
+        line = json.dumps(dict(fields, url=link), ensure_ascii=False) + "\n"
+        with open(ARCHIVE_MANIFEST, "ab+") as f:
+            # 이전 쓰기가 중간에 끊겨 줄바꿈이 없으면 새 줄에서 시작
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n": line = "\n" + line
+            f.write(line.encode("utf-8"))
+
+    def load_manifest(self):
+        """manifest.jsonl을 글 URL → 항목 dict로 병합 (뒤에 기록된 값 우선)"""
+        manifest = {}
+        if not os.path.exists(ARCHIVE_MANIFEST): return manifest
+        with open(ARCHIVE_MANIFEST, "r", encoding="utf-8") as f:
+            for line in f:
+                try: record = json.loads(line)
+                except ValueError: continue # 중단된 쓰기로 잘린 줄
+                manifest.setdefault(record.pop('url'), {}).update(record)
+        # 파일 경로만 있고 원본이 없는 항목은 제외
+        return {url: entry for url, entry in manifest.items() if 'body' in entry}
+
+    def load_archived_object(self, digest):
+        with gzip.open(self._object_path(digest), "rb") as f: data = f.read()
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise Exception(f"아카이브 손상: {digest}")
+        return data.decode("utf-8")
+
+    def _object_path(self, digest):
+        return os.path.join(ARCHIVE_PATH, "objects", digest[:2], f"{digest}.gz")
+
+    def _store_object(self, text):
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        obj_path = self._object_path(digest)
+        if not os.path.exists(obj_path): # 같은 내용은 한 번만 저장
+            os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+            with gzip.open(obj_path + ".tmp", "wb") as f: f.write(data)
+            os.replace(obj_path + ".tmp", obj_path)
+        return digest
 
     def clean_image_urls(self, html_content):
         soup = BeautifulSoup(html_content, 'html.parser')
@@ -226,7 +341,10 @@ class BlogBackupCore:
             log_callback(f"PR 스킵: {e}")
 
 if __name__ == "__main__":
-    if GUI_AVAILABLE:
+    if "--reconvert" in sys.argv:
+        # 스크래핑 없이 아카이브로부터 재변환
+        BlogBackupCore().process_reconvert()
+    elif GUI_AVAILABLE:
         class TistoryGUI:
             def __init__(self, root):
                 self.core = BlogBackupCore()
@@ -237,6 +355,7 @@ if __name__ == "__main__":
                 self.tree = ttk.Treeview(root, columns=("d","t"), show="headings"); self.tree.pack(fill="both", expand=True)
                 self.tree.heading("d", text="Date"); self.tree.heading("t", text="Title")
                 self.btn = tk.Button(root, text="실행", command=self.run); self.btn.pack(fill="x")
+                self.re_btn = tk.Button(root, text="아카이브에서 재변환", command=self.reconvert); self.re_btn.pack(fill="x")
                 self.log_t = scrolledtext.ScrolledText(root, height=10); self.log_t.pack(fill="both")
                 self.posts=[]
             def log(self, m): self.log_t.insert(tk.END, m+"\n"); self.log_t.see(tk.END)
@@ -246,7 +365,15 @@ if __name__ == "__main__":
                 for p in self.posts: self.tree.insert("","end",values=(p['date'],p['title']))
             def run(self):
                 sel=self.tree.selection()
-                if sel: threading.Thread(target=self.core.process_backup, args=(self.posts[self.tree.index(sel[0])], self.log)).start()
+                if sel: self.start(self.core.process_backup, self.posts[self.tree.index(sel[0])], self.log)
+            def reconvert(self): self.start(self.core.process_reconvert, self.log)
+            def start(self, target, *args):
+                # 백업/재변환은 같은 스테이징 폴더를 쓰므로 한 번에 하나만 실행
+                self.btn.config(state="disabled"); self.re_btn.config(state="disabled")
+                threading.Thread(target=self._worker, args=(target, args)).start()
+            def _worker(self, target, args):
+                try: target(*args)
+                finally: self.btn.config(state="normal"); self.re_btn.config(state="normal")
 
         root = tk.Tk()
         app = TistoryGUI(root)
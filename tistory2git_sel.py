@@ -1,5 +1,9 @@
 import os
 import re
+import sys
+import json
+import gzip
+import hashlib
 import threading
 import html
 import time
@@ -8,7 +12,8 @@ from bs4 import BeautifulSoup
 from openai import OpenAI
 from datetime import datetime
 from dotenv import load_dotenv
-from github import Github, GithubException
+from github import Github, GithubException, InputGitTreeElement, RateLimitExceededException
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import unquote, urlparse, parse_qs
 
 # Selenium 관련
@@ -31,6 +36,18 @@ TISTORY_ID = os.getenv("TISTORY_ID")
 TISTORY_PW = os.getenv("TISTORY_PW")
 
 REPO_LOCAL_PATH = "./temp_staging_area"
+# 원본 아카이브 (재변환용, content-addressed + gzip)
+ARCHIVE_PATH = "./raw_archive"
+ARCHIVE_MANIFEST = os.path.join(ARCHIVE_PATH, "manifest.jsonl")  # append-only, URL당 여러 줄 병합
+ARCHIVE_LOCK = threading.Lock()
+
+# 대량 백업 분할 (shard별 브랜치/커밋/PR)
+SHARD_BY = os.getenv("SHARD_BY", "count")  # count | bytes | month
+SHARD_MAX_FILES = int(os.getenv("SHARD_MAX_FILES", "100"))
+SHARD_MAX_BYTES = int(os.getenv("SHARD_MAX_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "3"))
+UPLOAD_RETRIES = 4       # GitHub rate limit 시 최대 시도 횟수
+RATE_LIMIT_WAIT = 60     # Retry-After 헤더가 없을 때 기본 대기(초)
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 # GUI 체크
@@ -46,6 +63,12 @@ class BlogBackupCore:
     def __init__(self):
         if not GITHUB_TOKEN or not TISTORY_BLOG_NAME:
             raise ValueError(".env 파일 설정을 확인해주세요 (TISTORY_BLOG_NAME 필수).")
+        if SHARD_BY not in ("count", "bytes", "month"):
+            raise ValueError(f"SHARD_BY는 count, bytes, month 중 하나여야 합니다: {SHARD_BY}")
+        # 잘못된 값이면 스크래핑/변환 전에 바로 중단
+        for name, value in (("SHARD_MAX_FILES", SHARD_MAX_FILES), ("SHARD_MAX_BYTES", SHARD_MAX_BYTES), ("UPLOAD_WORKERS", UPLOAD_WORKERS)):
+            if value <= 0:
+                raise ValueError(f"{name}는 1 이상의 정수여야 합니다: {value}")
         
         self.options = webdriver.ChromeOptions()
         self.options.add_argument("--disable-gpu")
@@ -209,41 +232,137 @@ class BlogBackupCore:
         print(f"📊 총 {len(all_posts)}개의 글을 수집했습니다.")
         return all_posts
 
-    def process_batch_backup(self, selected_posts, log_callback=print):
+    def process_batch_backup(self, selected_posts, log_callback=print, from_archive=False):
         if os.path.exists(REPO_LOCAL_PATH):
             shutil.rmtree(REPO_LOCAL_PATH)
         os.makedirs(REPO_LOCAL_PATH, exist_ok=True)
         
-        processed_titles = []
+        # 이미 게시된 글의 _posts 경로 (파일명 유지용)
+        known = {} if from_archive else self.load_manifest()
+        saved_posts = []
         total_count = len(selected_posts)
         log_callback(f"📦 총 {total_count}개 글 작업 시작.")
 
         for idx, post_data in enumerate(selected_posts):
             try:
                 log_callback(f"[{idx+1}/{total_count}] 변환: {post_data['title']}")
-                self.save_post_to_local(post_data, log_callback)
-                processed_titles.append(post_data['title'])
+                md_file = post_data.get('md_file') or known.get(post_data['url'], {}).get('md_file')
+                if from_archive:
+                    body_html = self.load_archived_object(post_data['body'])
+                    rel_path = self.convert_post_to_local(post_data, body_html, md_file)
+                else:
+                    rel_path = self.save_post_to_local(post_data, log_callback, md_file)
+                saved_posts.append({
+                    "title": post_data['title'],
+                    "date": post_data['date'],
+                    "path": rel_path,
+                    "size": os.path.getsize(os.path.join(REPO_LOCAL_PATH, rel_path))
+                })
             except Exception as e:
                 log_callback(f"❌ 실패 ({post_data['title']}): {e}")
 
-        if not processed_titles:
+        if not saved_posts:
             log_callback("⚠️ 성공한 글이 없습니다.")
             return
 
-        log_callback(f"☁️  GitHub 업로드 중... ({len(processed_titles)}개)")
-        summary = ", ".join(processed_titles)
-        if len(summary) > 50: summary = summary[:50] + "..."
-        commit_msg = f"Add {len(processed_titles)} posts: {summary}"
-        
-        self.upload_via_api(commit_msg, log_callback)
+        shards = self.plan_shards(saved_posts)
+        log_callback(f"☁️  GitHub 업로드 중... ({len(saved_posts)}개, {len(shards)}개 shard, 기준: {SHARD_BY})")
+
+        # shard끼리는 브랜치가 달라 서로 독립적이므로 동시에 업로드
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+            futures = {pool.submit(self.upload_shard, shard, log_callback): shard for shard in shards}
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    shard['pr_url'] = future.result()
+                    shard['state'] = "PR" if shard['pr_url'] else "커밋만 완료"
+                except Exception as e:
+                    shard['state'] = "실패"
+                    shard['error'] = str(e)
+                    log_callback(f"❌ [{shard['branch']}] 업로드 실패: {e}")
+
+        self.log_shard_summary(shards, log_callback, from_archive)
         log_callback("🎉 작업 완료!")
 
-    def save_post_to_local(self, post_data, log_callback):
+    def plan_shards(self, saved_posts):
+        """저장된 글 목록을 SHARD_BY 기준(파일 수 / 용량 / 월)으로 분할"""
+        # 같은 파일명은 마지막 결과만 업로드
+        unique = {p['path']: p for p in saved_posts}
+        posts = sorted(unique.values(), key=lambda p: (p['date'], p['path']))
+
+        groups, current, current_bytes = [], [], 0
+        for p in posts:
+            if current and (
+                len(current) >= SHARD_MAX_FILES
+                or (SHARD_BY == "bytes" and current_bytes + p['size'] > SHARD_MAX_BYTES)
+                or (SHARD_BY == "month" and current[-1]['date'][:7] != p['date'][:7])
+            ):
+                groups.append(current)
+                current, current_bytes = [], 0
+            current.append(p)
+            current_bytes += p['size']
+        if current: groups.append(current)
+
+        # shard가 하나면 기존처럼 backup 브랜치 사용
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        shards = []
+        for i, group in enumerate(groups):
+            branch = "backup" if len(groups) == 1 else f"backup-{run_id}-{i+1:03d}"
+            shards.append({
+                "index": i + 1,
+                "total": len(groups),
+                "branch": branch,
+                "posts": group,
+                "bytes": sum(p['size'] for p in group),
+                "date_range": f"{group[0]['date']}~{group[-1]['date']}",
+                "state": "대기",
+                "pr_url": None,
+                "error": None
+            })
+        return shards
+
+    def upload_shard(self, shard, log_callback):
+        posts = shard['posts']
+        summary = ", ".join(p['title'] for p in posts)
+        if len(summary) > 50: summary = summary[:50] + "..."
+        commit_msg = f"Add {len(posts)} posts: {summary}"
+        if shard['total'] > 1:
+            commit_msg = f"Add {len(posts)} posts ({shard['index']}/{shard['total']}, {shard['date_range']}): {summary}"
+
+        pr_body = "Batch Backup\n\n" + "\n".join(f"- {p['date']} {p['title']}" for p in posts)
+        shard_log = lambda m: log_callback(f"[{shard['branch']}] {m}")
+        return self.upload_via_api(commit_msg, shard_log, branch=shard['branch'],
+                                   paths=[p['path'] for p in posts], pr_body=pr_body)
+
+    def log_shard_summary(self, shards, log_callback, from_archive=False):
+        log_callback("-" * 60)
+        log_callback(f"📋 Shard 요약 ({len(shards)}개)")
+        for shard in shards:
+            line = (f"[{shard['index']}/{shard['total']}] {shard['branch']} | "
+                    f"{len(shard['posts'])}개, {shard['bytes'] / 1024:.1f}KB | {shard['date_range']} | {shard['state']}")
+            if shard['pr_url']: line += f" {shard['pr_url']}"
+            if shard['error']: line += f" ({shard['error']})"
+            log_callback(line)
+        failed = [s for s in shards if s['state'] == "실패"]
+        if failed:
+            # 실패한 shard는 브랜치가 만들어지지 않으므로 재시도해도 빈 브랜치가 쌓이지 않음
+            log_callback(f"⚠️ 실패한 shard {len(failed)}개 ({', '.join(s['branch'] for s in failed)})")
+            for shard in failed:
+                for p in shard['posts']: log_callback(f"   - {shard['branch']}: {p['date']} {p['title']}")
+            if from_archive:
+                log_callback("   --reconvert를 다시 실행하면 아카이브 전체를 다시 업로드합니다.")
+            else:
+                log_callback("   위 글만 다시 선택해 재시도하세요.")
+        log_callback("-" * 60)
+
+    def save_post_to_local(self, post_data, log_callback, md_file=None):
         if not self.driver: self.start_browser()
         self.driver.get(post_data['url'])
         time.sleep(1.5)
         
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+        # 아카이브 원본과 본문이 같은 시점의 페이지가 되도록 한 번만 읽음
+        page_source = self.driver.page_source
+        soup = BeautifulSoup(page_source, 'html.parser')
         
         # 본문 영역 찾기 (다양한 스킨 대응)
         content_div = soup.select_one('.tt_article_useless_p_margin') or \
@@ -255,26 +374,109 @@ class BlogBackupCore:
         if not content_div:
             raise Exception("본문 영역 없음")
 
-        # AI Slug
-        slug_resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": "You are a slug generator. Output ONLY English kebab-case string."},
-                      {"role": "user", "content": f"Convert: {post_data['title']}"}]
-        )
-        slug = re.sub(r'[^a-zA-Z0-9-]', '', slug_resp.choices[0].message.content.strip())
+        # 원본 보관 (변환 규칙이 바뀌어도 다시 스크래핑하지 않도록)
+        self.archive_post(post_data, page_source, str(content_div))
+        return self.convert_post_to_local(post_data, str(content_div), md_file)
+
+    def convert_post_to_local(self, post_data, body_html, md_file=None):
+        """본문 HTML → Markdown 변환 후 스테이징 영역에 저장 (스크래핑과 분리)"""
+        # AI Slug (이미 게시된 글은 기존 경로 재사용: 파일명이 바뀌면 중복 글이 생김)
+        if not md_file:
+            slug_resp = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "system", "content": "You are a slug generator. Output ONLY English kebab-case string."},
+                          {"role": "user", "content": f"Convert: {post_data['title']}"}],
+                temperature=0.0
+            )
+            slug = re.sub(r'[^a-zA-Z0-9-]', '', slug_resp.choices[0].message.content.strip())
+            md_file = f"_posts/{post_data['date']}-{slug}.md"
+            self.record_md_file(post_data['url'], md_file)
         
         # 이미지 처리
-        processed_html = self.clean_image_urls(str(content_div))
+        processed_html = self.clean_image_urls(body_html)
 
         # Markdown 변환
         md_content = self.convert_to_markdown(processed_html, post_data['title'], post_data['date'])
         md_content = html.unescape(md_content)
 
         # 저장
-        md_file = f"{post_data['date']}-{slug}.md"
-        md_path = os.path.join(REPO_LOCAL_PATH, "_posts", md_file)
+        md_path = os.path.join(REPO_LOCAL_PATH, md_file)
         os.makedirs(os.path.dirname(md_path), exist_ok=True)
         with open(md_path, "w", encoding="utf-8") as f: f.write(md_content)
+        return os.path.relpath(md_path, REPO_LOCAL_PATH)
+
+    def process_reconvert(self, log_callback=print):
+        """아카이브에 저장된 글 전체를 스크래핑 없이 다시 변환/업로드"""
+        posts = self.get_archived_posts()
+        if not posts:
+            log_callback("⚠️ 아카이브가 비어 있습니다.")
+            return
+        log_callback(f"♻️  아카이브 재변환: {len(posts)}개")
+        self.process_batch_backup(posts, log_callback, from_archive=True)
+
+    # --- 원본 아카이브 ---
+    def archive_post(self, post_data, raw_html, body_html):
+        """원본 페이지와 본문을 압축 저장하고 manifest에 글 URL과 함께 기록"""
+        with ARCHIVE_LOCK:
+            self._append_manifest(post_data['url'], {
+                "title": post_data['title'],
+                "date": post_data['date'],
+                "status": post_data.get('status', ""),
+                "raw": self._store_object(raw_html),
+                "body": self._store_object(body_html),
+                "archived_at": datetime.now().isoformat(timespec="seconds"),
+            })
+
+    def record_md_file(self, url, md_file):
+        """게시된 _posts 경로 기록 (두 스크립트가 파일명 형식이 달라도 같은 파일을 갱신하도록)"""
+        with ARCHIVE_LOCK:
+            self._append_manifest(url, {"md_file": md_file})
+
+    def _append_manifest(self, url, fields):
+        # 글마다 manifest 전체를 다시 쓰지 않도록 한 줄씩 추가
+        os.makedirs(ARCHIVE_PATH, exist_ok=True)
+        line = json.dumps(dict(fields, url=url), ensure_ascii=False) + "\n"
+        with open(ARCHIVE_MANIFEST, "ab+") as f:
+            # 이전 쓰기가 중간에 끊겨 줄바꿈이 없으면 새 줄에서 시작
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n": line = "\n" + line
+            f.write(line.encode("utf-8"))
+
+    def get_archived_posts(self):
+        """manifest를 get_post_list()와 같은 형태의 목록으로 변환"""
+        return [dict(entry, url=url) for url, entry in self.load_manifest().items()]
+
+    def load_manifest(self):
+        """manifest.jsonl을 글 URL → 항목 dict로 병합 (뒤에 기록된 값 우선)"""
+        manifest = {}
+        if not os.path.exists(ARCHIVE_MANIFEST): return manifest
+        with open(ARCHIVE_MANIFEST, "r", encoding="utf-8") as f:
+            for line in f:
+                try: record = json.loads(line)
+                except ValueError: continue # 중단된 쓰기로 잘린 줄
+                manifest.setdefault(record.pop('url'), {}).update(record)
+        # 파일 경로만 있고 원본이 없는 항목은 제외
+        return {url: entry for url, entry in manifest.items() if 'body' in entry}
+
+    def load_archived_object(self, digest):
+        with gzip.open(self._object_path(digest), "rb") as f: data = f.read()
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise Exception(f"아카이브 손상: {digest}")
+        return data.decode("utf-8")
+
+    def _object_path(self, digest):
+        return os.path.join(ARCHIVE_PATH, "objects", digest[:2], f"{digest}.gz")
+
+    def _store_object(self, text):
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        obj_path = self._object_path(digest)
+        if not os.path.exists(obj_path): # 같은 내용은 한 번만 저장
+            os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+            with gzip.open(obj_path + ".tmp", "wb") as f: f.write(data)
+            os.replace(obj_path + ".tmp", obj_path)
+        return digest
 
     def clean_image_urls(self, html_content):
         soup = BeautifulSoup(html_content, 'html.parser')
@@ -323,38 +525,70 @@ class BlogBackupCore:
         )
         return resp.choices[0].message.content
 
-    def upload_via_api(self, commit_msg, log_callback):
+    def upload_via_api(self, commit_msg, log_callback, branch="backup", paths=None, pr_body="Batch Backup"):
         g = Github(GITHUB_TOKEN)
         repo = g.get_repo(GITHUB_REPO_NAME)
-        branch = "backup"
-        
-        try: repo.get_branch(branch)
-        except: 
-            sb = repo.get_branch("main")
-            repo.create_git_ref(f"refs/heads/{branch}", sb.commit.sha)
-
-        for root, _, files in os.walk(REPO_LOCAL_PATH):
-            for file in files:
-                if file.startswith('.'): continue
-                full_path = os.path.join(root, file)
-                rel_path = os.path.relpath(full_path, REPO_LOCAL_PATH)
-                with open(full_path, "rb") as f: content = f.read()
-                try:
-                    c = repo.get_contents(rel_path, ref=branch)
-                    repo.update_file(c.path, commit_msg, content, c.sha, branch=branch)
-                    log_callback(f"UPDATE: {rel_path}")
-                except:
-                    repo.create_file(rel_path, commit_msg, content, branch=branch)
-                    log_callback(f"CREATE: {rel_path}")
+
+        # 404만 "브랜치 없음"으로 처리 (rate limit/5xx를 없음으로 오판하면 기존 브랜치와 충돌)
+        try: branch_ref = self._with_retry(lambda: repo.get_git_ref(f"heads/{branch}"), log_callback)
+        except GithubException as e:
+            if e.status != 404: raise
+            branch_ref = None
+        base_sha = branch_ref.object.sha if branch_ref else repo.get_branch("main").commit.sha
+
+        if paths is None:
+            paths = []
+            for root, _, files in os.walk(REPO_LOCAL_PATH):
+                for file in files:
+                    if file.startswith('.'): continue
+                    paths.append(os.path.relpath(os.path.join(root, file), REPO_LOCAL_PATH))
+
+        # 파일마다 커밋하지 않고 브랜치당 커밋 1개로 묶음 (본문은 tree에 직접 포함, blob 요청 없음)
+        parent = repo.get_git_commit(base_sha)
+        elements = []
+        for rel_path in paths:
+            with open(os.path.join(REPO_LOCAL_PATH, rel_path), "rb") as f: content = f.read()
+            elements.append(InputGitTreeElement(rel_path.replace(os.sep, "/"), "100644", "blob", content=content.decode("utf-8")))
+            log_callback(f"STAGE: {rel_path}")
+        tree = self._with_retry(lambda: repo.create_git_tree(elements, parent.tree), log_callback)
+        commit = self._with_retry(lambda: repo.create_git_commit(commit_msg, tree, [parent]), log_callback)
+
+        # 브랜치는 커밋이 만들어진 뒤에 생성 (중간에 실패해도 빈 브랜치가 남지 않음)
+        if branch_ref:
+            self._with_retry(lambda: branch_ref.edit(commit.sha), log_callback)
+        else:
+            self._with_retry(lambda: repo.create_git_ref(f"refs/heads/{branch}", commit.sha), log_callback)
+        log_callback(f"COMMIT: {commit.sha[:7]} ({len(elements)}개 파일)")
 
         try:
             pulls = repo.get_pulls(state='open', head=f"{repo.owner.login}:{branch}", base='main')
             if pulls.totalCount == 0:
-                pr = repo.create_pull(title=f"[Auto] {commit_msg}", body="Batch Backup", head=branch, base="main")
+                pr = self._with_retry(lambda: repo.create_pull(title=f"[Auto] {commit_msg}", body=pr_body, head=branch, base="main"), log_callback)
                 log_callback(f"🚀 PR 생성: {pr.html_url}")
-            else:
-                log_callback(f"ℹ️ PR 존재: {pulls[0].html_url}")
-        except Exception as e: log_callback(f"PR 스킵: {e}")
+                return pr.html_url
+            log_callback(f"ℹ️ PR 존재: {pulls[0].html_url}")
+            return pulls[0].html_url
+        except Exception as e:
+            log_callback(f"PR 스킵: {e}")
+            return None
+
+    def _with_retry(self, request, log_callback):
+        """GitHub rate limit(보조 제한 포함)에 걸리면 기다렸다가 재시도"""
+        for attempt in range(1, UPLOAD_RETRIES + 1):
+            try:
+                return request()
+            except RateLimitExceededException as e:
+                if attempt == UPLOAD_RETRIES: raise
+                headers = {k.lower(): v for k, v in (getattr(e, "headers", None) or {}).items()}
+                if headers.get("retry-after"):
+                    wait = int(headers["retry-after"])
+                elif headers.get("x-ratelimit-reset") and headers.get("x-ratelimit-remaining", "0") == "0":
+                    # primary rate limit: 한도가 초기화되는 시각까지 대기
+                    wait = max(int(headers["x-ratelimit-reset"]) - int(time.time()), 0) + 1
+                else:
+                    wait = RATE_LIMIT_WAIT * attempt
+                log_callback(f"⏳ GitHub rate limit, {wait}초 후 재시도 ({attempt}/{UPLOAD_RETRIES - 1})")
+                time.sleep(wait)
 
     def __del__(self):
         if self.driver: 
@@ -362,7 +596,10 @@ class BlogBackupCore:
             except: pass
 
 if __name__ == "__main__":
-    if GUI_AVAILABLE:
+    if "--reconvert" in sys.argv:
+        # 스크래핑(로그인) 없이 아카이브로부터 재변환
+        BlogBackupCore().process_reconvert()
+    elif GUI_AVAILABLE:
         class TistoryGUI:
             def __init__(self, root):
                 self.core = BlogBackupCore()
@@ -383,6 +620,9 @@ if __name__ == "__main__":
                 
                 self.btn = tk.Button(root, text="🚀 선택 항목 일괄 백업 & PR", command=self.run_batch, bg="#eee", height=2)
                 self.btn.pack(fill="x", padx=10, pady=5)
+
+                self.re_btn = tk.Button(root, text="♻️ 아카이브에서 전체 재변환 & PR", command=self.run_reconvert)
+                self.re_btn.pack(fill="x", padx=10)
                 
                 self.log_t = scrolledtext.ScrolledText(root, height=12)
                 self.log_t.pack(fill="both")
@@ -411,12 +651,30 @@ if __name__ == "__main__":
                 if not sel: return messagebox.showwarning("!", "글을 선택해주세요.")
                 
                 posts = [self.posts[self.tree.index(i)] for i in sel]
-                self.btn.config(state="disabled", text="작업 진행 중...")
+                self.set_busy(True, self.btn, "작업 진행 중...")
                 threading.Thread(target=self._worker, args=(posts,)).start()
                 
+            def run_reconvert(self):
+                self.set_busy(True, self.re_btn, "재변환 진행 중...")
+                threading.Thread(target=self._reconvert_worker).start()
+
+            def set_busy(self, busy, active_btn=None, text=None):
+                # 백업/재변환은 같은 스테이징 폴더를 비우고 쓰므로 한 번에 하나만 실행
+                state = "disabled" if busy else "normal"
+                self.btn.config(state=state)
+                self.re_btn.config(state=state)
+                if busy: active_btn.config(text=text)
+                else:
+                    self.btn.config(text="🚀 선택 항목 일괄 백업 & PR")
+                    self.re_btn.config(text="♻️ 아카이브에서 전체 재변환 & PR")
+
+            def _reconvert_worker(self):
+                try: self.core.process_reconvert(self.log)
+                finally: self.set_busy(False)
+
             def _worker(self, posts):
-                self.core.process_batch_backup(posts, self.log)
-                self.btn.config(state="normal", text="🚀 선택 항목 일괄 백업 & PR")
+                try: self.core.process_batch_backup(posts, self.log)
+                finally: self.set_busy(False)
 
         root = tk.Tk()
         app = TistoryGUI(root)